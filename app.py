@@ -1,18 +1,29 @@
 from __future__ import annotations
 import os
 import csv
+import time
+import hashlib
+from uuid import uuid4
 from collections import Counter
 from flask import (
-    Flask, render_template, request, redirect, url_for, flash, jsonify
+    Flask, render_template, request, redirect, url_for, flash, jsonify,
+    session, make_response, send_file, abort, g
 )
 from werkzeug.utils import secure_filename
 
 # --- Utils (make sure these files exist in utils/)
 from utils.resume_parser import extract_text_from_file, clean_text
-from utils.text_similarity import tfidf_match, suggest_missing_skills
+from utils.text_similarity import (
+    MatchState, suggest_missing_skills, whatif_skill_deltas, observe_documents
+)
 from utils.ats_checker import quick_ats_check
 from utils.experience import detect_level
-from utils.db import init_db, save_run, list_runs, delete_run, clear_runs
+from utils.db import (
+    init_db, save_run, list_runs, delete_run, clear_runs, get_run, find_similar_runs
+)
+from utils.minhash import signature as resume_signature, decode as decode_minhash
+from utils.assets import prepare_assets, pick_variant, IMMUTABLE
+from utils.admission import AdmissionController
 
 # ---------------- App setup ----------------
 BASE_DIR = os.path.dirname(__file__)
@@ -22,14 +33,54 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 app = Flask(__name__)
 app.secret_key = "dev-secret"  # replace for production
 init_db()  # create data/app.db and table if missing
+ASSET_MANIFEST = prepare_assets()  # static/dist: hashed + .gz/.br copies
 
 ALLOWED_EXT = {"pdf", "docx", "txt"}
 
+# Admission control: CPU-heavy analysis routes get a small lane of their own.
+# Counters and limits are per worker process. Defaults derive from the worker's
+# thread count (WEB_THREADS, passed to gunicorn --threads in the Procfile): the
+# heavy lane plus its queue leave at least one thread free for light routes.
+# The light lane defaults to the thread count with no queue, so under gunicorn
+# it only counts requests; its limits bite only on servers with more threads.
+WEB_THREADS = max(1, int(os.environ.get("WEB_THREADS", 4)))
+_HEAVY_DEFAULT = max(1, WEB_THREADS // 2)
+ADMISSION = AdmissionController(
+    heavy_endpoints={"analyze", "api_analyze"},
+    heavy_limit=int(os.environ.get("ANALYZE_CONCURRENCY", _HEAVY_DEFAULT)),
+    heavy_queue=int(os.environ.get("ANALYZE_QUEUE", max(0, WEB_THREADS - _HEAVY_DEFAULT - 1))),
+    heavy_wait=float(os.environ.get("ANALYZE_QUEUE_TIMEOUT", 10)),
+    light_limit=int(os.environ.get("LIGHT_CONCURRENCY", WEB_THREADS)),
+    light_queue=int(os.environ.get("LIGHT_QUEUE", 0)),
+    light_wait=float(os.environ.get("LIGHT_QUEUE_TIMEOUT", 5)),
+)
+UNGATED_ENDPOINTS = {"static", "dist_asset", "admission_stats"}
+
+# Near-duplicate resumes (MinHash estimate of shingle Jaccard)
+# 0.7 suits the 16x4 LSH banding: >= ~99% of runs at the threshold become candidates
+SIMILAR_THRESHOLD = float(os.environ.get("SIMILAR_THRESHOLD", 0.7))  # listed as "similar"
+
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXT
 
 
+def parse_upload(file_storage) -> str:
+    """
+    Save an uploaded resume under a unique name, extract its text, delete it.
+    Unique names keep concurrent uploads of e.g. resume.pdf from clobbering each other.
+    """
+    path = os.path.join(UPLOAD_DIR, f"{uuid4().hex}_{secure_filename(file_storage.filename)}")
+    file_storage.save(path)
+    try:
+        return extract_text_from_file(path)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
 # ---------------- Dataset helpers ----------------
 def _jd_csv_path() -> str:
     return os.path.join(BASE_DIR, "data", "job_descriptions.csv")
@@ -69,11 +120,118 @@ def load_role_descriptions(role: str | None) -> list[str]:
     return descs
 
 
+def catalog_version() -> str:
+    # changes whenever the JD csv is edited; keys the rendered-page cache
+    try:
+        st = os.stat(_jd_csv_path())
+        return f"{st.st_mtime_ns}-{st.st_size}"
+    except OSError:
+        return "none"
+
+
+# ---------------- Admission control ----------------
+@app.before_request
+def admit_request():
+    if request.endpoint is None or request.endpoint in UNGATED_ENDPOINTS:
+        return None
+    lane = ADMISSION.lane_for(request.endpoint)
+    if not lane.acquire():
+        retry = lane.retry_after()
+        msg = "Server busy, please retry shortly."
+        if request.path.startswith("/api/"):
+            resp = jsonify({"error": msg, "retry_after": retry})
+        else:
+            resp = make_response(msg)
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(retry)
+        return resp
+    g.admission_lane = lane
+    g.admission_start = time.monotonic()
+    return None
+
+
+@app.teardown_request
+def release_request(exc=None):
+    lane = g.pop("admission_lane", None)
+    if lane is not None:
+        lane.release(time.monotonic() - g.pop("admission_start", time.monotonic()))
+
+
+@app.get("/api/admission")
+def admission_stats():
+    # counters of the worker that answered; poll repeatedly to see every pid
+    return jsonify({"pid": os.getpid(), **ADMISSION.stats()})
+
+
+# ---------------- Static assets + page cache ----------------
+@app.context_processor
+def inject_asset_url():
+    def asset_url(rel: str) -> str:
+        hashed = ASSET_MANIFEST.get(rel)
+        if hashed:
+            return url_for("dist_asset", filename=hashed)
+        return url_for("static", filename=rel)
+    return {"asset_url": asset_url}
+
+
+@app.get("/assets/<path:filename>")
+def dist_asset(filename: str):
+    if filename not in ASSET_MANIFEST.values():
+        abort(404)
+    path, encoding, mimetype = pick_variant(filename, request.headers.get("Accept-Encoding", ""))
+    resp = send_file(path, mimetype=mimetype, conditional=True, max_age=31536000)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = IMMUTABLE
+    return resp
+
+
+_page_cache: dict[str, tuple[str, str, str]] = {}  # endpoint -> (version, body, etag)
+
+
+def cached_page(endpoint: str, render):
+    # flashed messages are per-user; render those pages fresh
+    if session.get("_flashes"):
+        return render()
+    version = catalog_version()
+    hit = _page_cache.get(endpoint)
+    if hit is None or hit[0] != version:
+        body = render()
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        hit = _page_cache[endpoint] = (version, body, etag)
+    resp = make_response(hit[1])
+    resp.set_etag(hit[2])
+    resp.headers["Cache-Control"] = "no-cache"  # always revalidate, cheap 304s
+    return resp.make_conditional(request)
+
+
+def _public_run(r: dict) -> dict:
+    keys = ("id", "filename", "role_hint", "match_percent", "ats_score", "created_at", "similarity")
+    return {k: r.get(k) for k in keys}
+
+
+def resume_features(resume_raw: str, resume_clean: str) -> dict:
+    """ATS + experience for a resume, plus its MinHash signature and similar past runs."""
+    sig = resume_signature(resume_clean)
+    similar: list[dict] = []
+    if sig:
+        try:
+            similar = find_similar_runs(sig, threshold=SIMILAR_THRESHOLD, limit=5)
+        except Exception as e:
+            app.logger.warning(f"Similar-run lookup failed: {e}")
+    return {
+        "ats": quick_ats_check(resume_raw),
+        "experience": detect_level(resume_raw),
+        "minhash": sig,
+        "similar_runs": [_public_run(r) for r in similar],
+    }
+
+
 # ---------------- Routes ----------------
 @app.get("/")
 def index():
-    roles = load_roles_list()
-    return render_template("index.html", roles=roles)
+    return cached_page("index", lambda: render_template("index.html", roles=load_roles_list()))
 
 
 @app.post("/analyze")
@@ -93,13 +251,9 @@ def analyze():
         flash("Paste a Job Description or pick a role from dataset.")
         return redirect(url_for("index"))
 
-    # save upload
+    # save upload + parse + clean resume
     filename = secure_filename(resume_file.filename)
-    saved_path = os.path.join(UPLOAD_DIR, filename)
-    resume_file.save(saved_path)
-
-    # parse + clean resume
-    resume_raw = extract_text_from_file(saved_path)
+    resume_raw = parse_upload(resume_file)
     resume = clean_text(resume_raw)
 
     # JD bundle (either dropdown role or typed textarea)
@@ -116,9 +270,11 @@ def analyze():
     scores: list[float] = []
     agg_overlap, agg_missing, agg_top_terms = set(), set(), []
 
+    states: list[MatchState] = []  # kept for the what-if deltas below
     for jd_one in jd_list:
-        jd_clean = clean_text(jd_one)
-        res = tfidf_match(resume, jd_clean)
+        state = MatchState(resume, clean_text(jd_one))
+        states.append(state)
+        res = state.result()
         scores.append(res["match_percent"])
         agg_overlap |= set(res["top_overlap"])
         agg_missing |= set(res["missing_keywords"])
@@ -128,10 +284,11 @@ def analyze():
     top_terms = [t for t, _ in Counter(agg_top_terms).most_common(15)]
 
     # ATS + Experience + Suggestions (use first JD text if textarea empty)
-    ats = quick_ats_check(resume_raw)
-    exp = detect_level(resume_raw)
+    feats = resume_features(resume_raw, resume)
+    ats, exp = feats["ats"], feats["experience"]
     jd_for_suggest = jd_text if jd_text else (jd_list[0] if jd_list else "")
     missing_suggestions = suggest_missing_skills(resume_raw, jd_for_suggest, role_hint=role_hint)
+    skill_deltas = whatif_skill_deltas(states, missing_suggestions[:10])
 
     result = {
         "match_percent": match_percent,
@@ -139,22 +296,29 @@ def analyze():
         "missing_keywords": sorted(list(agg_missing))[:10],
         "jd_top_terms": top_terms,
         "suggested_skills": missing_suggestions[:10],
+        "skill_deltas": skill_deltas,
         "ats_score": ats["ats_score"],
         "ats_warnings": ats["warnings"],
         "filename": filename,
         "role_hint": role_hint or "",
         "experience": exp,
+        "similar_runs": feats["similar_runs"],
+        "run_id": None,  # set once saved; links the similar-runs view
     }
 
+    # corpus IDF stats (no-op unless IDF_LEARN=1); catalog JDs are already counted
+    observe_documents([resume] + ([clean_text(jd_text)] if jd_text else []))
+
     # save to history (non-blocking best-effort)
     try:
-        save_run(
+        result["run_id"] = save_run(
             filename=result.get("filename"),
             role_hint=result.get("role_hint"),
             match_percent=result.get("match_percent"),
             ats_score=result.get("ats_score"),
             top_keywords=result.get("top_keywords"),
             missing_keywords=result.get("missing_keywords"),
+            minhash=feats["minhash"],
         )
     except Exception as e:
         app.logger.warning(f"Failed to save run: {e}")
@@ -186,9 +350,7 @@ def api_analyze():
     if "resume" in request.files and request.files["resume"].filename:
         f = request.files["resume"]
         if allowed_file(f.filename):
-            path = os.path.join(UPLOAD_DIR, secure_filename(f.filename))
-            f.save(path)
-            resume_text = extract_text_from_file(path)
+            resume_text = parse_upload(f)
 
     if not resume_text:
         return jsonify({"error": "Provide resume_text or upload a resume file."}), 400
@@ -207,9 +369,11 @@ def api_analyze():
 
     scores: list[float] = []
     agg_overlap, agg_missing, agg_top_terms = set(), set(), []
+    states: list[MatchState] = []  # kept for the what-if deltas below
     for jd_one in jd_list:
-        jd_clean = clean_text(jd_one)
-        res = tfidf_match(resume_clean, jd_clean)
+        state = MatchState(resume_clean, clean_text(jd_one))
+        states.append(state)
+        res = state.result()
         scores.append(res["match_percent"])
         agg_overlap |= set(res["top_overlap"])
         agg_missing |= set(res["missing_keywords"])
@@ -218,10 +382,11 @@ def api_analyze():
     match_percent = round(sum(scores) / max(1, len(scores)), 2)
     top_terms = [t for t, _ in Counter(agg_top_terms).most_common(15)]
 
-    ats = quick_ats_check(resume_text)
-    exp = detect_level(resume_text)
+    feats = resume_features(resume_text, resume_clean)
+    ats, exp = feats["ats"], feats["experience"]
     jd_for_suggest = jd_text if jd_text else (jd_list[0] if jd_list else "")
     missing_suggestions = suggest_missing_skills(resume_text, jd_for_suggest, role_hint=role_hint)
+    skill_deltas = whatif_skill_deltas(states, missing_suggestions[:10])
 
     result = {
         "match_percent": match_percent,
@@ -229,11 +394,14 @@ def api_analyze():
         "missing_keywords": sorted(list(agg_missing))[:10],
         "jd_top_terms": top_terms,
         "suggested_skills": missing_suggestions[:10],
+        "skill_deltas": skill_deltas,
         "ats_score": ats["ats_score"],
         "ats_warnings": ats["ats_warnings"] if isinstance(ats, dict) and "ats_warnings" in ats else ats.get("warnings", []),
         "experience": exp,
         "role_hint": role_hint or "",
+        "similar_runs": feats["similar_runs"],
     }
+    observe_documents([resume_clean] + ([clean_text(jd_text)] if jd_text else []))
     return jsonify(result)
 
 
@@ -241,8 +409,17 @@ def api_analyze():
 @app.get("/history")
 def history():
     q = (request.args.get("q") or "").strip() or None
+    similar_to = request.args.get("similar", type=int)
+    if similar_to:
+        base = get_run(similar_to)
+        if base is None:
+            abort(404)
+        sig = decode_minhash(base.get("minhash"))
+        runs = find_similar_runs(sig, threshold=SIMILAR_THRESHOLD, limit=200,
+                                 exclude_id=similar_to) if sig else []
+        return render_template("history.html", runs=runs, q="", similar_to=base)
     runs = list_runs(search=q, limit=200, offset=0)
-    return render_template("history.html", runs=runs, q=q or "")
+    return render_template("history.html", runs=runs, q=q or "", similar_to=None)
 
 
 @app.post("/history/delete")
@@ -262,7 +439,7 @@ def history_clear():
 # ---------------- Docs page ----------------
 @app.get("/docs")
 def docs():
-    return render_template("docs.html")
+    return cached_page("docs", lambda: render_template("docs.html"))
 
 
 # ---------------- Dev server ----------------
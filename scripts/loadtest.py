@@ -0,0 +1,456 @@
+"""
+Load test: start the app under gunicorn (Procfile shape by default) and replay
+a weighted mix of requests, then report throughput, per-route latency
+percentiles, error/timeout rates and worker CPU/RSS as JSON.
+
+    python scripts/loadtest.py --duration 30 --concurrency 16
+    python scripts/loadtest.py --rps 20 --workers 4 --threads 2 --out runs/w4t2.json
+    python scripts/loadtest.py --url http://127.0.0.1:5000   # existing server, no CPU/RSS
+
+Mix weights: --mix api_text=4,api_pdf=2,api_docx=2,api_role=2,history=3,static=3
+"""
+from __future__ import annotations
+import os
+import io
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = "api_text=4,api_pdf=2,api_docx=2,api_role=2,history=3,static=3"
+HISTORY_QUERIES = ["", "data", "analyst", "engineer", "resume", "pdf"]
+JD_TEXT = ("Python, SQL, Excel, dashboards, data visualization (Tableau/Power BI), "
+           "statistics, business metrics, data cleaning, reporting.")
+
+
+# ---------------- Fixtures ----------------
+def _resume_text() -> str:
+    with open(os.path.join(ROOT, "resume.txt"), "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def _make_pdf(text: str, path: str):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    c = canvas.Canvas(path, pagesize=A4)
+    y = 800
+    for line in text.splitlines():
+        if y < 40:
+            c.showPage()
+            y = 800
+        c.drawString(40, y, line[:110])
+        y -= 14
+    c.save()
+
+
+def _make_docx(text: str, path: str):
+    from docx import Document
+    doc = Document()
+    for line in text.splitlines():
+        doc.add_paragraph(line)
+    doc.save(path)
+
+
+def build_fixtures(tmpdir: str) -> dict:
+    text = _resume_text()
+    fx = {"text": text, "pdf": None, "docx": None}
+    for kind, maker in (("pdf", _make_pdf), ("docx", _make_docx)):
+        path = os.path.join(tmpdir, f"resume.{kind}")
+        try:
+            maker(text, path)
+            with open(path, "rb") as f:
+                fx[kind] = f.read()
+        except Exception as e:  # reportlab / python-docx missing
+            print(f"[loadtest] skipping {kind} uploads: {e}", file=sys.stderr)
+    return fx
+
+
+def load_roles() -> list[str]:
+    import csv
+    with open(os.path.join(ROOT, "data", "job_descriptions.csv"), encoding="utf-8") as f:
+        return sorted({(r.get("role") or "").strip() for r in csv.DictReader(f)} - {""})
+
+
+# ---------------- HTTP ----------------
+def _multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    boundary = uuid4().hex
+    buf = io.BytesIO()
+    for name, value in fields.items():
+        buf.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n".encode())
+        buf.write(str(value).encode("utf-8") + b"\r\n")
+    for name, (filename, data) in files.items():
+        buf.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; "
+                  f"filename=\"{filename}\"\r\nContent-Type: application/octet-stream\r\n\r\n".encode())
+        buf.write(data + b"\r\n")
+    buf.write(f"--{boundary}--\r\n".encode())
+    return buf.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+class Scenarios:
+    """Builds one request (route label, urllib Request) per call, by mix weight."""
+
+    def __init__(self, base_url: str, fixtures: dict, mix: dict[str, float], roles: list[str]):
+        self.base = base_url.rstrip("/")
+        self.fx = fixtures
+        self.roles = roles or ["Data Analyst"]
+        self.assets: list[str] = []
+        available = {
+            "api_text": True, "api_pdf": bool(fixtures["pdf"]), "api_docx": bool(fixtures["docx"]),
+            "api_role": True, "history": True, "static": True,
+        }
+        self.names = [k for k, w in mix.items() if w > 0 and available.get(k)]
+        self.weights = [mix[k] for k in self.names]
+        if not self.names:
+            raise SystemExit("empty request mix")
+
+    def discover_assets(self):
+        import re
+        with urllib.request.urlopen(self.base + "/", timeout=10) as r:
+            html = r.read().decode("utf-8", "ignore")
+        self.assets = re.findall(r'(?:href|src)="(/(?:assets|static)/[^"]+)"', html)
+
+    def pick(self) -> tuple[str, urllib.request.Request]:
+        name = random.choices(self.names, self.weights)[0]
+        return name, getattr(self, f"_{name}")()
+
+    def _api(self, fields: dict, files: dict | None = None) -> urllib.request.Request:
+        body, ctype = _multipart(fields, files or {})
+        return urllib.request.Request(self.base + "/api/analyze", data=body,
+                                      headers={"Content-Type": ctype}, method="POST")
+
+    def _api_text(self):
+        return self._api({"resume_text": self.fx["text"], "job_description": JD_TEXT})
+
+    def _api_pdf(self):
+        return self._api({"job_description": JD_TEXT}, {"resume": ("loadtest.pdf", self.fx["pdf"])})
+
+    def _api_docx(self):
+        return self._api({"job_description": JD_TEXT}, {"resume": ("loadtest.docx", self.fx["docx"])})
+
+    def _api_role(self):
+        return self._api({"resume_text": self.fx["text"], "role_hint": random.choice(self.roles)})
+
+    def _history(self):
+        q = random.choice(HISTORY_QUERIES)
+        return urllib.request.Request(self.base + "/history" + (f"?q={q}" if q else ""))
+
+    def _static(self):
+        path = random.choice(self.assets) if self.assets else "/"
+        return urllib.request.Request(self.base + path, headers={"Accept-Encoding": "gzip, br"})
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: dict[str, list[tuple[float, str]]] = {}
+        self.dropped = 0  # open loop: arrivals still queued locally at the deadline
+
+    def add(self, route: str, latency: float, outcome: str):
+        with self.lock:
+            self.samples.setdefault(route, []).append((latency, outcome))
+
+
+def fire(scen: Scenarios, rec: Recorder, timeout: float, due: float | None = None):
+    # open loop passes the scheduled arrival (perf_counter), so time spent
+    # waiting for a client thread counts as latency (no coordinated omission)
+    route, req = scen.pick()
+    t0 = time.perf_counter() if due is None else due
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            r.read()
+        outcome = "ok"
+    except urllib.error.HTTPError as e:
+        outcome = "rejected" if e.code == 503 else f"http_{e.code}"
+    except (socket.timeout, TimeoutError):
+        outcome = "timeout"
+    except Exception as e:
+        outcome = "timeout" if "timed out" in str(e) else "error"
+    rec.add(route, time.perf_counter() - t0, outcome)
+
+
+def run_closed(scen, rec, concurrency: int, duration: float, timeout: float):
+    deadline = time.monotonic() + duration
+
+    def loop():
+        while time.monotonic() < deadline:
+            fire(scen, rec, timeout)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open(scen, rec, rps: float, concurrency: int, duration: float, timeout: float):
+    # fixed arrival rate; requests that can't get a client thread queue locally.
+    # Submission stops at the deadline and whatever is still queued is dropped,
+    # so a backlog can't stretch the run past --duration.
+    interval = 1.0 / rps
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    futures = []
+    i = 0
+    while True:
+        due = start + i * interval
+        if due - start >= duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        futures.append(pool.submit(fire, scen, rec, timeout, due))
+        i += 1
+    pool.shutdown(wait=True, cancel_futures=True)  # in-flight requests finish
+    rec.dropped += sum(1 for f in futures if f.cancelled())
+
+
+# ---------------- Server + worker stats ----------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int, threads: int, env_overrides: dict) -> subprocess.Popen:
+    env = dict(os.environ, WEB_THREADS=str(threads), **env_overrides)
+    cmd = [sys.executable, "-m", "gunicorn", "app:app", f"--workers={workers}",
+           f"--threads={threads}", "--timeout=120", f"--bind=127.0.0.1:{port}"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("gunicorn exited during startup (is it installed?)")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/docs", timeout=1).read()
+            return proc
+        except Exception:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("server did not become ready within 30s")
+
+
+class WorkerSampler(threading.Thread):
+    """Samples CPU time and RSS of the gunicorn workers from /proc (Linux only)."""
+
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.stop_evt = threading.Event()
+        self.first_cpu: dict[int, float] = {}
+        self.last_cpu: dict[int, float] = {}
+        self.max_rss: dict[int, int] = {}
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def _children(self) -> list[int]:
+        pids = []
+        for d in os.listdir("/proc"):
+            if not d.isdigit():
+                continue
+            try:
+                with open(f"/proc/{d}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                if int(fields[1]) == self.master_pid:
+                    pids.append(int(d))
+            except (OSError, IndexError, ValueError):
+                continue
+        return pids
+
+    def _sample(self):
+        for pid in self._children():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu = (int(fields[11]) + int(fields[12])) / self.tick
+                with open(f"/proc/{pid}/status") as f:
+                    rss = next(int(l.split()[1]) for l in f if l.startswith("VmRSS:"))
+            except (OSError, StopIteration, IndexError, ValueError):
+                continue
+            self.first_cpu.setdefault(pid, cpu)
+            self.last_cpu[pid] = cpu
+            self.max_rss[pid] = max(self.max_rss.get(pid, 0), rss)
+
+    def run(self):
+        if not os.path.isdir("/proc"):
+            return
+        while not self.stop_evt.is_set():
+            self._sample()
+            self.stop_evt.wait(self.interval)
+        self._sample()
+
+    def report(self, elapsed: float) -> list[dict]:
+        out = []
+        for pid in sorted(self.last_cpu):
+            cpu_s = self.last_cpu[pid] - self.first_cpu[pid]
+            out.append({
+                "pid": pid,
+                "cpu_seconds": round(cpu_s, 2),
+                "cpu_percent": round(100 * cpu_s / max(elapsed, 1e-9), 1),
+                "max_rss_mb": round(self.max_rss.get(pid, 0) / 1024, 1),
+            })
+        return out
+
+
+def collect_admission(base: str, workers: int, attempts_per_worker: int = 10) -> dict | None:
+    """
+    /api/admission answers with the counters of whichever worker served it;
+    poll until every worker has answered (or we give up) and sum the lanes.
+    """
+    per_worker: dict[str, dict] = {}
+    for _ in range(max(1, workers) * attempts_per_worker):
+        try:
+            with urllib.request.urlopen(base + "/api/admission", timeout=5) as r:
+                stats = json.loads(r.read())
+        except Exception:
+            continue
+        per_worker[str(stats.pop("pid", "?"))] = stats
+        if len(per_worker) >= workers:
+            break
+    if not per_worker:
+        return None
+    totals: dict[str, dict] = {}
+    for stats in per_worker.values():
+        for lane, counters in stats.items():
+            agg = totals.setdefault(lane, {})
+            for key in ("active", "queue_depth", "admitted", "rejected", "timed_out"):
+                agg[key] = agg.get(key, 0) + counters.get(key, 0)
+    return {"workers_seen": len(per_worker), "totals": totals, "per_worker": per_worker}
+
+
+# ---------------- Report ----------------
+def _pct(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # nearest-rank
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    routes = {}
+    total = ok = 0
+    for route, samples in sorted(rec.samples.items()):
+        lat = sorted(s[0] * 1000 for s in samples)
+        outcomes: dict[str, int] = {}
+        for _, o in samples:
+            outcomes[o] = outcomes.get(o, 0) + 1
+        n = len(samples)
+        total += n
+        ok += outcomes.get("ok", 0)
+        routes[route] = {
+            "requests": n,
+            "throughput_rps": round(n / elapsed, 2),
+            "p50_ms": round(_pct(lat, 50), 1),
+            "p95_ms": round(_pct(lat, 95), 1),
+            "p99_ms": round(_pct(lat, 99), 1),
+            "max_ms": round(lat[-1], 1) if lat else 0.0,
+            "error_rate": round(1 - outcomes.get("ok", 0) / n, 4) if n else 0.0,
+            "timeout_rate": round(outcomes.get("timeout", 0) / n, 4) if n else 0.0,
+            "outcomes": outcomes,
+        }
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "ok_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "dropped": rec.dropped,
+        "routes": routes,
+    }
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if part.strip():
+            k, _, v = part.partition("=")
+            mix[k.strip()] = float(v or 1)
+    return mix
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SmartHire load test")
+    ap.add_argument("--url", help="target an already running server instead of starting one")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--env", action="append", default=[],
+                    help="KEY=VALUE passed to the server, e.g. ANALYZE_CONCURRENCY=3")
+    ap.add_argument("--mix", default=DEFAULT_MIX)
+    ap.add_argument("--concurrency", type=int, default=16, help="client threads")
+    ap.add_argument("--rps", type=float, default=0, help="open-loop arrival rate (0 = closed loop)")
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--timeout", type=float, default=30, help="per-request client timeout (s)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write the JSON report here (also printed)")
+    args = ap.parse_args(argv)
+
+    random.seed(args.seed)
+    env_overrides = dict(e.split("=", 1) for e in args.env)
+    proc = None
+    sampler = None
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = build_fixtures(tmp)
+        if args.url:
+            base = args.url
+        else:
+            port = _free_port()
+            proc = start_server(port, args.workers, args.threads, env_overrides)
+            base = f"http://127.0.0.1:{port}"
+        try:
+            scen = Scenarios(base, fixtures, parse_mix(args.mix), load_roles())
+            scen.discover_assets()
+            rec = Recorder()
+            if proc is not None:
+                sampler = WorkerSampler(proc.pid)
+                sampler.start()
+            t0 = time.monotonic()
+            if args.rps > 0:
+                run_open(scen, rec, args.rps, args.concurrency, args.duration, args.timeout)
+            else:
+                run_closed(scen, rec, args.concurrency, args.duration, args.timeout)
+            elapsed = time.monotonic() - t0
+            if sampler is not None:
+                sampler.stop_evt.set()
+                sampler.join()
+            admission = collect_admission(base, args.workers if proc is not None else 1)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    report = {
+        "config": {
+            "url": args.url, "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads, "env": env_overrides,
+            "mix": parse_mix(args.mix), "concurrency": args.concurrency, "rps": args.rps,
+            "duration_s": args.duration, "timeout_s": args.timeout, "seed": args.seed,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+        },
+        **summarize(rec, elapsed),
+        "workers": sampler.report(elapsed) if sampler else [],
+        "admission": admission,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# utils/admission.py
+import math
+import time
+import threading
+
+
+class Lane:
+    """
+    Concurrency limit + bounded FIFO wait queue for one class of routes.
+    acquire() returns False straight away when the queue is full, or after
+    `wait_timeout` seconds in the queue, so callers can fail fast.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, wait_timeout: float):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.queue_size = max(0, int(queue_size))
+        self.wait_timeout = float(wait_timeout)
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0  # next ticket allowed to take a free slot
+        self._skip: set[int] = set()  # tickets abandoned by timed-out waiters
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_service = 1.0  # EWMA seconds, seeds the Retry-After estimate
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.limit and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self.waiting += 1
+            deadline = time.monotonic() + self.wait_timeout
+            try:
+                while not (self.active < self.limit and ticket == self._serving):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        if ticket == self._serving:
+                            self._serving += 1
+                        else:
+                            self._skip.add(ticket)
+                        self._advance()
+                        return False
+                    self._cond.wait(remaining)
+                self._serving += 1
+                self._advance()
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+                self._cond.notify_all()
+
+    def _advance(self):
+        while self._serving in self._skip:
+            self._skip.discard(self._serving)
+            self._serving += 1
+
+    def release(self, elapsed: float | None = None):
+        with self._cond:
+            self.active -= 1
+            if elapsed is not None:
+                self.avg_service = 0.8 * self.avg_service + 0.2 * elapsed
+            self._cond.notify_all()
+
+    def retry_after(self) -> int:
+        # time for the current queue to drain through `limit` slots
+        return max(1, math.ceil(self.avg_service * (self.waiting + 1) / self.limit))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_service_s": round(self.avg_service, 3),
+            }
+
+
+class AdmissionController:
+    """
+    Maps endpoints to lanes. Heavy (CPU-bound) endpoints share a small lane so
+    light pages always have threads left; everything else uses the light lane.
+    Queued requests still hold a server thread, so keep heavy_limit + heavy_queue
+    below the per-worker thread count.
+    """
+
+    def __init__(self, heavy_endpoints: set[str], heavy_limit: int = 2, heavy_queue: int = 1,
+                 heavy_wait: float = 10.0, light_limit: int = 4, light_queue: int = 8,
+                 light_wait: float = 5.0):
+        self.heavy_endpoints = set(heavy_endpoints)
+        self.lanes = {
+            "heavy": Lane("heavy", heavy_limit, heavy_queue, heavy_wait),
+            "light": Lane("light", light_limit, light_queue, light_wait),
+        }
+
+    def lane_for(self, endpoint: str | None) -> Lane:
+        return self.lanes["heavy" if endpoint in self.heavy_endpoints else "light"]
+
+    def stats(self) -> dict:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
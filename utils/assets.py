@@ -0,0 +1,105 @@
+# utils/assets.py
+import os, json, gzip, hashlib, mimetypes
+
+try:  # optional: brotli variants only when the package is installed
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+# Files fingerprinted by the build step (paths relative to static/)
+ASSETS = ["css/style.css", "js/dashboard.js"]
+
+# Content-Encoding -> file suffix, in server preference order
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _hashed_name(rel: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    root, ext = os.path.splitext(rel)
+    return f"{root}.{digest}{ext}"
+
+
+def build_assets(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    """
+    Copy each asset to dist/ under a content-hashed name, plus .gz/.br variants.
+    Idempotent: files whose hash already exists are not rewritten.
+    """
+    manifest: dict[str, str] = {}
+    for rel in ASSETS:
+        src = os.path.join(static_dir, rel)
+        try:
+            with open(src, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        hashed = _hashed_name(rel, data)
+        out = os.path.join(dist_dir, hashed)
+        if not os.path.exists(out):
+            _write_atomic(out, data)
+        if not os.path.exists(out + ".gz"):
+            _write_atomic(out + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None and not os.path.exists(out + ".br"):
+            _write_atomic(out + ".br", brotli.compress(data, quality=11))
+        manifest[rel] = hashed
+    _write_atomic(os.path.join(dist_dir, "manifest.json"),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def prepare_assets(dist_dir: str = DIST_DIR) -> dict:
+    """
+    Build at startup when static/ is writable; on a read-only deploy fall back
+    to a manifest prebuilt with `python -m utils.assets`, keeping only entries
+    whose files exist. An empty manifest means plain /static URLs.
+    """
+    try:
+        return build_assets(dist_dir=dist_dir)
+    except OSError:
+        manifest = load_manifest(os.path.join(dist_dir, "manifest.json"))
+        return {rel: hashed for rel, hashed in manifest.items()
+                if os.path.isfile(os.path.join(dist_dir, hashed))}
+
+
+def pick_variant(filename: str, accept_encoding: str, dist_dir: str = DIST_DIR):
+    """
+    Return (path, content_encoding|None, mimetype) for the best precompressed
+    variant the client accepts, or the plain file.
+    """
+    path = os.path.join(dist_dir, filename)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for enc, suffix in ENCODINGS:
+        if enc in accepted and os.path.isfile(path + suffix):
+            return path + suffix, enc, mimetype
+    return path, None, mimetype
+
+
+if __name__ == "__main__":
+    print(json.dumps(build_assets(), indent=2))
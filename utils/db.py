@@ -17,6 +17,9 @@ def get_conn():
 
 def init_db():
     with get_conn() as conn:
+        # one write transaction: gunicorn workers boot together and would
+        # otherwise race on the ALTER TABLE migrations below
+        conn.execute("BEGIN IMMEDIATE")
         conn.execute("""
         CREATE TABLE IF NOT EXISTS runs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -29,15 +32,52 @@ def init_db():
             missing_keywords TEXT
         )
         """)
+        # MinHash signature (added later; migrate old DBs)
+        cols = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+        if "minhash" not in cols:
+            conn.execute("ALTER TABLE runs ADD COLUMN minhash TEXT")
+        # LSH banding index: one row per (band, bucket) of each run's signature
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_bands (
+            band INTEGER,
+            bucket TEXT,
+            run_id INTEGER
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_run_bands ON run_bands (band, bucket)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_run_bands_run ON run_bands (run_id)")
+        # learned document frequencies (IDF_LEARN=1), shared by all workers;
+        # `version` marks the flush that last changed a term, for incremental reloads
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS idf_terms (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        cols = {row["name"] for row in conn.execute("PRAGMA table_info(idf_terms)")}
+        if "version" not in cols:
+            conn.execute("ALTER TABLE idf_terms ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_idf_terms_version ON idf_terms (version)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS idf_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        # hashes of documents already counted, so re-uploads don't inflate df
+        conn.execute("CREATE TABLE IF NOT EXISTS idf_docs (hash TEXT PRIMARY KEY)")
         conn.commit()
 
 def save_run(filename: str, role_hint: str, match_percent: float, ats_score: int,
-             top_keywords: list[str], missing_keywords: list[str]):
+             top_keywords: list[str], missing_keywords: list[str],
+             minhash: list[int] | None = None) -> int:
     from json import dumps
+    from .minhash import band_keys, encode
     with get_conn() as conn:
-        conn.execute("""
-        INSERT INTO runs (filename, role_hint, match_percent, ats_score, created_at, top_keywords, missing_keywords)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        cur = conn.execute("""
+        INSERT INTO runs (filename, role_hint, match_percent, ats_score, created_at, top_keywords,
+                          missing_keywords, minhash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             filename or "",
             role_hint or "",
@@ -46,8 +86,16 @@ def save_run(filename: str, role_hint: str, match_percent: float, ats_score: int
             datetime.utcnow().isoformat(timespec="seconds"),
             dumps(top_keywords or []),
             dumps(missing_keywords or []),
+            encode(minhash) if minhash else None,
         ))
+        run_id = cur.lastrowid
+        if minhash:
+            conn.executemany(
+                "INSERT INTO run_bands (band, bucket, run_id) VALUES (?, ?, ?)",
+                [(b, bucket, run_id) for b, bucket in band_keys(minhash)],
+            )
         conn.commit()
+        return run_id
 
 def list_runs(search: str | None = None, limit: int = 100, offset: int = 0):
     q = "SELECT * FROM runs"
@@ -62,12 +110,91 @@ def list_runs(search: str | None = None, limit: int = 100, offset: int = 0):
         cur = conn.execute(q, args)
         return [dict(row) for row in cur.fetchall()]
 
+def add_idf_documents(docs: dict[str, set[str]]) -> int:
+    """
+    Count documents (hash -> distinct terms) into idf_terms with df = df + n,
+    skipping hashes counted before. One write transaction per call, so
+    versions increase in commit order across processes. Returns docs added.
+    """
+    from collections import Counter
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        new = [h for h in docs
+               if conn.execute("INSERT OR IGNORE INTO idf_docs (hash) VALUES (?)", (h,)).rowcount]
+        if new:
+            counts = Counter()
+            for h in new:
+                counts.update(docs[h])
+            conn.execute("""
+            INSERT INTO idf_meta (key, value) VALUES ('version', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+            """)
+            version = conn.execute("SELECT value FROM idf_meta WHERE key = 'version'").fetchone()["value"]
+            conn.executemany("""
+            INSERT INTO idf_terms (term, df, version) VALUES (?, ?, ?)
+            ON CONFLICT(term) DO UPDATE SET df = df + excluded.df, version = excluded.version
+            """, [(t, n, version) for t, n in counts.items()])
+            conn.execute("""
+            INSERT INTO idf_meta (key, value) VALUES ('n_docs', ?)
+            ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+            """, (len(new),))
+        conn.commit()
+        return len(new)
+
+def load_idf_counts(since: int = -1) -> tuple[int, int, dict[str, int]]:
+    """(version, n_docs, {term: df}) for terms changed after version `since`."""
+    with get_conn() as conn:
+        conn.execute("BEGIN")  # one snapshot for meta + terms
+        meta = {r["key"]: r["value"] for r in conn.execute("SELECT key, value FROM idf_meta")}
+        terms = {r["term"]: r["df"] for r in conn.execute(
+            "SELECT term, df FROM idf_terms WHERE version > ?", (since,))}
+        conn.rollback()
+        return int(meta.get("version", 0)), int(meta.get("n_docs", 0)), terms
+
+def get_run(run_id: int):
+    with get_conn() as conn:
+        row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+def find_similar_runs(minhash: list[int], threshold: float = 0.7, limit: int = 10,
+                      exclude_id: int | None = None):
+    """
+    Runs whose resume is a near-duplicate of `minhash`: LSH band lookup for
+    candidates, then estimated Jaccard >= threshold. Adds a "similarity" key.
+    Keep threshold near 0.7: the 16x4 banding misses about a third of pairs at 0.5.
+    """
+    from .minhash import band_keys, decode, similarity
+    keys = band_keys(minhash)
+    if not keys:
+        return []
+    where = " OR ".join(["(band = ? AND bucket = ?)"] * len(keys))
+    args = [v for key in keys for v in key]
+    with get_conn() as conn:
+        ids = [r["run_id"] for r in conn.execute(
+            f"SELECT DISTINCT run_id FROM run_bands WHERE {where}", args)]
+        ids = [i for i in ids if i != exclude_id]
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        rows = conn.execute(f"SELECT * FROM runs WHERE id IN ({marks})", ids).fetchall()
+    out = []
+    for row in rows:
+        sim = similarity(minhash, decode(row["minhash"]))
+        if sim >= threshold:
+            d = dict(row)
+            d["similarity"] = round(sim, 3)
+            out.append(d)
+    out.sort(key=lambda d: (-d["similarity"], -d["id"]))
+    return out[:limit]
+
 def delete_run(run_id: int):
     with get_conn() as conn:
         conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        conn.execute("DELETE FROM run_bands WHERE run_id = ?", (run_id,))
         conn.commit()
 
 def clear_runs():
     with get_conn() as conn:
         conn.execute("DELETE FROM runs")
+        conn.execute("DELETE FROM run_bands")
         conn.commit()
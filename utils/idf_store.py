@@ -0,0 +1,237 @@
+# utils/idf_store.py
+import os, csv, math, time, atexit, hashlib, threading
+from array import array
+from collections import Counter
+from statistics import median
+
+from .db import add_idf_documents, load_idf_counts
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CATALOG_PATH = os.path.join(DATA_DIR, "job_descriptions.csv")
+# Background corpus: plain text, one document per line (e.g. job posts), "#" comments
+BACKGROUND_PATH = os.environ.get("IDF_BACKGROUND", os.path.join(DATA_DIR, "idf_background.txt"))
+
+# Feed analyzed resumes / typed JDs into the shared SQLite counts
+LEARN = os.environ.get("IDF_LEARN", "0") == "1"
+FLUSH_SECONDS = float(os.environ.get("IDF_FLUSH_SECONDS", 30))
+# idf for terms the corpus has never seen: "median" (a typical known term; with
+# the background corpus that is a term seen once), "min" (as common as the most
+# common known term) or a number
+UNSEEN = os.environ.get("IDF_UNSEEN", "median")
+
+
+def _smooth_idf(n_docs: int, df: int) -> float:
+    return math.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+class DocFreqStore:
+    """
+    Document frequencies over a growing vocabulary: term -> slot in a compact
+    uint32 array. Counts = seed corpus (catalog + background, built at start)
+    + learned counts merged from SQLite + documents learned here but not yet
+    flushed. idf() uses the smooth formula ln((1+N)/(1+df)) + 1; unseen terms
+    get a capped idf (see IDF_UNSEEN) instead of the maximum. Generic words are
+    kept down by the background corpus, where they are common.
+
+    Learned counts load incrementally: refresh() only reads terms changed since
+    the last version it saw, and updates slots in place.
+    """
+
+    def __init__(self, unseen: str = UNSEEN):
+        self.unseen = unseen
+        self._seed: Counter = Counter()
+        self._seed_docs = 0
+        self._pending: dict[str, frozenset] = {}  # doc hash -> terms, not yet in SQLite
+        self._flushed: list[frozenset] = []  # in SQLite, still counted locally until refresh
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (vocab, df) swapped as one tuple so readers never mix old and new;
+        # later growth only appends, df slot before vocab entry
+        self._table: tuple[dict[str, int], array] = ({}, array("I"))
+        self._learned = array("I")  # learned (SQLite) part of df, same slots
+        self._learned_docs = 0
+        self._version = -1  # last idf_meta version merged
+        self.n_docs = 0
+        self._max_df = 0
+        self._unseen_df = 1
+        self._stats_size = 0  # vocab size when max/median were last computed
+        self._unseen_idf: float | None = None  # fixed value when IDF_UNSEEN is a number
+        if unseen not in ("min", "median"):
+            self._unseen_idf = float(unseen)
+
+    def seed_document(self, terms) -> None:
+        with self._lock:
+            self._seed.update(set(terms))
+            self._seed_docs += 1
+
+    def _slot(self, term: str) -> int:
+        # caller holds self._lock
+        vocab, df = self._table
+        idx = vocab.get(term)
+        if idx is None:
+            idx = len(df)
+            df.append(0)
+            self._learned.append(0)
+            vocab[term] = idx
+        return idx
+
+    def add_document(self, terms, key: str) -> None:
+        """Count a learned document here now; flush() shares it with other workers."""
+        terms = frozenset(terms)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending[key] = terms
+            df = self._table[1]
+            for term in terms:
+                idx = self._slot(term)
+                df[idx] += 1
+                self._max_df = max(self._max_df, df[idx])
+            self.n_docs += 1
+            if self.unseen == "min":  # full stats wait for the background refresh
+                self._unseen_df = max(1, self._max_df)
+
+    def doc_freq(self, term: str) -> int:
+        vocab, df = self._table
+        idx = vocab.get(term)
+        return 0 if idx is None else df[idx]
+
+    def idf(self, term: str) -> float:
+        df = self.doc_freq(term)
+        if df == 0 and self._unseen_idf is not None:
+            return self._unseen_idf
+        return _smooth_idf(self.n_docs, df or self._unseen_df)
+
+    def _update_stats(self, force: bool = False) -> None:
+        # caller holds self._lock. max/median over the whole array only when
+        # the vocabulary grew 10% since last time; max is also kept as a running value
+        df = self._table[1]
+        if force or len(df) >= 1.1 * self._stats_size:
+            self._stats_size = len(df)
+            self._max_df = max(df) if df else 0
+            if self.unseen == "median":
+                self._unseen_df = max(1, int(median(df))) if df else 1
+        if self.unseen == "min":
+            self._unseen_df = max(1, self._max_df)
+
+    def _build_seed(self) -> None:
+        vocab, df = {}, array("I")
+        with self._lock:
+            for term, count in self._seed.items():
+                vocab[term] = len(df)
+                df.append(count)
+            self._table = (vocab, df)
+            self._learned = array("I", bytes(df.itemsize * len(df)))
+            self.n_docs = self._seed_docs
+            self._update_stats(force=True)
+
+    def refresh(self) -> None:
+        """Merge learned counts (from every worker) changed since the last refresh."""
+        version, learned_docs, learned = load_idf_counts(since=self._version)
+        with self._lock:
+            vocab, df = self._table
+            for terms in self._flushed:  # now part of `learned`
+                for term in terms:
+                    df[vocab[term]] -= 1
+            self._flushed = []
+            for term, total in learned.items():
+                idx = self._slot(term)
+                df[idx] += total - self._learned[idx]
+                self._learned[idx] = total
+                self._max_df = max(self._max_df, df[idx])
+            self._version = version
+            self._learned_docs = learned_docs
+            self.n_docs = self._seed_docs + learned_docs + len(self._pending)
+            self._update_stats()
+
+    def flush(self) -> None:
+        """Write pending documents to SQLite (deduplicated by hash), then refresh."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if pending:
+                try:
+                    add_idf_documents({k: set(v) for k, v in pending.items()})
+                except Exception:
+                    with self._lock:  # keep them for the next flush
+                        for key, terms in pending.items():
+                            self._pending.setdefault(key, terms)
+                    return
+                with self._lock:
+                    self._flushed.extend(pending.values())
+            try:
+                self.refresh()
+            except Exception:
+                pass  # _flushed is subtracted on the next successful refresh
+
+
+# ---------------- Seeding ----------------
+def _read_catalog(path: str = CATALOG_PATH) -> list[str]:
+    out: list[str] = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for row in csv.DictReader(f):
+                d = (row.get("description") or "").strip()
+                if d:
+                    out.append(d)
+    except OSError:
+        pass
+    return out
+
+
+def _read_background(path: str = BACKGROUND_PATH) -> list[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError:
+        return []
+
+
+_store: DocFreqStore | None = None
+_store_lock = threading.Lock()
+
+
+def _flush_loop(store: DocFreqStore):
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        store.flush()
+
+
+def get_store(analyzer) -> DocFreqStore:
+    """
+    Process-wide store seeded from the JD catalog and the optional background
+    corpus, plus learned counts from SQLite. With IDF_LEARN=1 a daemon thread
+    flushes new counts every IDF_FLUSH_SECONDS, off the request path.
+    `analyzer(text) -> terms` must be the same one used for scoring.
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            store = DocFreqStore()
+            for doc in _read_catalog() + _read_background():
+                store.seed_document(analyzer(doc))
+            store._build_seed()
+            try:
+                store.refresh()
+            except Exception:
+                pass  # seed counts only
+            if LEARN:
+                threading.Thread(target=_flush_loop, args=(store,), daemon=True).start()
+                atexit.register(store.flush)
+            _store = store
+    return _store
+
+
+def observe(store: DocFreqStore, analyzer, texts) -> None:
+    """
+    Count analyzed documents when IDF_LEARN=1 (in memory; flushed in the
+    background). Keyed by content hash, so the same text is counted once.
+    """
+    if not LEARN:
+        return
+    for t in texts:
+        if t:
+            key = hashlib.blake2b(t.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+            store.add_document(analyzer(t), key)
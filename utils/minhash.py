@@ -0,0 +1,69 @@
+# utils/minhash.py
+import hashlib
+import numpy as np
+
+from .text_similarity import tokenize
+
+NUM_PERM = 64
+# 16 bands x 4 rows: P(candidate) = 1 - (1 - J**4)**16, i.e. ~99% at J=0.7,
+# ~89% at J=0.6, ~64% at J=0.5 and ~3% at J=0.2
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1  # a*x+b stays below 2**62, no uint64 overflow
+
+# fixed seed: signatures are stored in the DB and must match across processes
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, k: int = 2) -> set[str]:
+    """k-token shingles over tokenize(); short texts fall back to single tokens."""
+    toks = tokenize(text or "")
+    if len(toks) < k:
+        return set(toks)
+    return {" ".join(toks[i:i + k]) for i in range(len(toks) - k + 1)}
+
+
+def _hash32(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def signature(text: str) -> list[int]:
+    sh = shingles(text)
+    if not sh:
+        return []
+    x = np.fromiter((_hash32(s) % _PRIME for s in sh), dtype=np.uint64, count=len(sh))
+    sig = ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+    return [int(v) for v in sig]
+
+
+def band_keys(sig: list[int]) -> list[tuple[int, str]]:
+    """(band, bucket) pairs for the LSH index; near-duplicates share at least one."""
+    if len(sig) != NUM_PERM:
+        return []
+    out = []
+    for b in range(BANDS):
+        chunk = ",".join(str(v) for v in sig[b * ROWS:(b + 1) * ROWS])
+        out.append((b, hashlib.blake2b(chunk.encode(), digest_size=8).hexdigest()))
+    return out
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def encode(sig: list[int]) -> str:
+    return ",".join(str(v) for v in sig)
+
+
+def decode(s: str | None) -> list[int]:
+    if not s:
+        return []
+    try:
+        return [int(v) for v in s.split(",")]
+    except ValueError:
+        return []
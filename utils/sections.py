@@ -1,27 +1,86 @@
 # utils/sections.py
 import re
+import hashlib
+import threading
+from collections import OrderedDict
 
-SECTION_PATTERNS = [
-    ("experience", r"(experience|work experience|employment)\b"),
-    ("projects", r"(projects?)\b"),
-    ("skills", r"(skills|technologies|tech stack)\b"),
-    ("education", r"(education|academics)\b"),
-    ("summary", r"(summary|objective|profile)\b"),
+# Heading keyword -> section name. A line opens a section when it contains one
+# of these keywords; the leftmost keyword on the line decides the section.
+SECTION_HEADINGS = [
+    ("experience", ("experience", "work experience", "employment")),
+    ("projects", ("project", "projects")),
+    ("skills", ("skills", "technologies", "tech stack")),
+    ("education", ("education", "academics")),
+    ("summary", ("summary", "objective", "profile")),
 ]
 
+HEADING_TABLE: dict[str, str] = {
+    kw: name for name, keywords in SECTION_HEADINGS for kw in keywords
+}
+
+# One alternation, longest keywords first. No leading/trailing ".*", so a
+# search is linear in the length of the line.
+HEADING_RE = re.compile(
+    r"(?i)\b("
+    + "|".join(re.escape(k) for k in sorted(HEADING_TABLE, key=len, reverse=True))
+    + r")\b"
+)
+
+_CACHE_SIZE = 256
+_span_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _classify_line(t: str, start: int, end: int) -> str | None:
+    m = HEADING_RE.search(t, start, end)
+    if not m:
+        return None
+    return HEADING_TABLE[m.group(1).lower()]
+
+
+def _scan(t: str) -> tuple:
+    # single pass over lines; each line yields at most one boundary
+    bounds: list[tuple[str, int]] = []
+    pos, n = 0, len(t)
+    while pos <= n:
+        nl = t.find("\n", pos)
+        end = n if nl == -1 else nl
+        name = _classify_line(t, pos, end)
+        if name:
+            bounds.append((name, pos))
+        if nl == -1:
+            break
+        pos = nl + 1
+
+    spans = tuple(
+        (name, start, bounds[i + 1][1] if i + 1 < len(bounds) else n)
+        for i, (name, start) in enumerate(bounds)
+    )
+    # fallback: whole text as summary if no headings
+    if not spans:
+        spans = (("summary", 0, n),)
+    return spans
+
+
+def section_spans(text: str) -> tuple:
+    """
+    Return ((name, start, end), ...) offsets into `text`, cached by content hash.
+    """
+    t = text or ""
+    key = hashlib.blake2b(t.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _cache_lock:
+        hit = _span_cache.get(key)
+        if hit is not None:
+            _span_cache.move_to_end(key)
+            return hit
+    spans = _scan(t)
+    with _cache_lock:
+        _span_cache[key] = spans
+        if len(_span_cache) > _CACHE_SIZE:
+            _span_cache.popitem(last=False)
+    return spans
+
+
 def split_sections(text: str):
     t = text or ""
-    # simple heading-based split
-    indices = []
-    for name, pat in SECTION_PATTERNS:
-        for m in re.finditer(rf"(?im)^.*{pat}.*$", t):
-            indices.append((m.start(), name))
-    indices.sort()
-    chunks = []
-    for i, (pos, name) in enumerate(indices):
-        end = indices[i+1][0] if i + 1 < len(indices) else len(t)
-        chunks.append((name, t[pos:end]))
-    # fallback: whole text as summary if no headings
-    if not chunks:
-        chunks = [("summary", t)]
-    return chunks
+    return [(name, t[start:end]) for name, start, end in section_spans(t)]
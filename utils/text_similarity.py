@@ -1,10 +1,9 @@
 # utils/text_similarity.py
 from __future__ import annotations
 import re
+import math
+from collections import Counter
 from typing import List, Dict
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 # ---- Phrase canonicalization & variant expansion
 PHRASE_MAP: list[tuple[str, str]] = [
@@ -96,19 +95,41 @@ def tokenize(raw: str) -> List[str]:
     deduped = list(dict.fromkeys(expanded))
     return deduped
 
-def build_tfidf() -> TfidfVectorizer:
-    return TfidfVectorizer(
-        tokenizer=tokenize,
-        ngram_range=(1, 2),
-        min_df=1,
-        max_df=1.0,      # keep shared terms for 2-doc fit
-        sublinear_tf=True,
-        use_idf=True,
-        lowercase=False
-    )
+# ---- Term vectors with fixed corpus IDF (no per-call fit)
+# Unigrams + bigrams of tokenize(), sublinear tf, l2-normalized cosine; idf
+# comes from the DocFreqStore.
+from .idf_store import get_store, observe
+
+def _ngrams(tokens: List[str], prev: str | None = None) -> List[str]:
+    grams = list(tokens)
+    seq = ([prev] if prev else []) + list(tokens)
+    grams += [f"{a} {b}" for a, b in zip(seq, seq[1:])]
+    return grams
+
+def _tf(count: int) -> float:
+    return 1.0 + math.log(count) if count else 0.0
+
+def analyze_terms(text: str) -> List[str]:
+    return _ngrams(tokenize(normalize_text(text)))
+
+def idf_store():
+    return get_store(analyze_terms)
+
+def observe_documents(texts: List[str]) -> None:
+    """Feed analyzed JDs/resumes into the IDF store (no-op unless IDF_LEARN=1)."""
+    observe(idf_store(), analyze_terms, texts)
+
+def term_vector(terms: List[str], idf) -> tuple[dict[str, float], float]:
+    weights = {t: _tf(c) * idf(t) for t, c in Counter(terms).items()}
+    return weights, sum(w * w for w in weights.values())
+
+def _cosine(dot: float, n2a: float, n2b: float) -> float:
+    if n2a <= 0 or n2b <= 0:
+        return 0.0
+    return dot / math.sqrt(n2a * n2b)
 
 # ---- Section-weighted similarity
-from .sections import split_sections
+from .sections import section_spans
 
 SECTION_WEIGHTS = {
     "experience": 1.0,
@@ -118,79 +139,124 @@ SECTION_WEIGHTS = {
     "summary":    0.5,
 }
 
-def weighted_cosine(resume_text: str, jd_text: str) -> Dict:
-    r_secs = split_sections(resume_text)
-    j_secs = split_sections(jd_text)
-    if not j_secs:
-        return {"score": 0.0}
-
-    vec = build_tfidf()
-    sims: list[float] = []
-    weights: list[float] = []
-
-    # For each JD section, take the best matching resume section (same name preferred)
-    for jname, jchunk in j_secs:
-        jw = float(SECTION_WEIGHTS.get(jname, 0.5))
-        best = 0.0
-        jn = normalize_text(jchunk)
-        for rname, rchunk in r_secs:
-            rn = normalize_text(rchunk)
-            X = vec.fit_transform([jn, rn])
-            if X[0].nnz == 0 or X[1].nnz == 0:
-                sim = 0.0
-            else:
-                sim = float(cosine_similarity(X[0], X[1])[0][0])
-            if rname == jname:
-                sim *= 1.05  # tiny boost for same-section match
-            if sim > best:
-                best = sim
-        sims.append(best)
-        weights.append(jw)
-
-    sims_arr = np.array(sims, dtype=float)
-    w_arr = np.array(weights, dtype=float)
-    score = float((sims_arr * w_arr).sum() / max(1e-9, w_arr.sum()))
-    return {"score": score}
+class _PairState:
+    """JD weights + resume term counts/norm of one (jd, resume) pair."""
+
+    def __init__(self, jd_vec: tuple[dict, float], res_tokens: List[str], idf):
+        self.jd_w, self.jn2 = jd_vec
+        self.idf = idf
+        res_terms = _ngrams(res_tokens)
+        self.res_counts = Counter(res_terms)
+        res_w, self.rn2 = term_vector(res_terms, idf)
+        if len(res_w) < len(self.jd_w):
+            self.dot = sum(w * self.jd_w.get(t, 0.0) for t, w in res_w.items())
+        else:
+            self.dot = sum(w * res_w.get(t, 0.0) for t, w in self.jd_w.items())
+        self.res_set = set(res_tokens)
+        self.res_last = res_tokens[-1] if res_tokens else None
+
+    def cosine(self) -> float:
+        return _cosine(self.dot, self.jn2, self.rn2)
+
+    def cosine_with(self, add_tokens: List[str]) -> float:
+        # IDF is fixed by the store, so appending tokens only changes the
+        # resume-side weights of the terms they add: patch dot + resume norm.
+        # tokenize() dedupes, so only tokens new to this resume chunk count.
+        new = [t for t in add_tokens if t not in self.res_set]
+        if not new:
+            return self.cosine()
+        dot, rn2 = self.dot, self.rn2
+        for term, inc in Counter(_ngrams(new, prev=self.res_last)).items():
+            rc = self.res_counts.get(term, 0)
+            idf = self.idf(term)
+            wr_old, wr_new = _tf(rc) * idf, _tf(rc + inc) * idf
+            dot += self.jd_w.get(term, 0.0) * (wr_new - wr_old)
+            rn2 += wr_new * wr_new - wr_old * wr_old
+        return _cosine(dot, self.jn2, rn2)
 
 # ---- Final TF-IDF matcher (blends global + section-weighted)
+class MatchState:
+    """
+    Term vectors + norms of one (resume, jd) analysis. Vectorized once; score()
+    is the match_percent, and score(add="skill") rescores with the skill
+    appended to the resume (it lands in the last section) without re-vectorizing.
+    """
+
+    def __init__(self, resume_text: str, jd_text: str):
+        idf = idf_store().idf
+        self.jd_vec = term_vector(analyze_terms(jd_text), idf)
+        res_tokens = tokenize(normalize_text(resume_text))
+        self.global_pair = _PairState(self.jd_vec, res_tokens, idf)
+        self.jd_terms = set(tokenize(jd_text))
+        self.res_terms = set(res_tokens)
+        # vectorize each resume section once, not once per JD section
+        r_toks = [(rname, tokenize(normalize_text(resume_text[rs:rend])))
+                  for rname, rs, rend in section_spans(resume_text)]
+        self.sections: list[tuple[str, float, list[tuple[str, _PairState]]]] = []
+        for jname, js, je in section_spans(jd_text):
+            jv = term_vector(analyze_terms(jd_text[js:je]), idf)
+            pairs = [(rname, _PairState(jv, rt, idf)) for rname, rt in r_toks]
+            self.sections.append((jname, float(SECTION_WEIGHTS.get(jname, 0.5)), pairs))
+
+    def section_score(self, add_tokens: List[str] | None = None) -> float:
+        if not self.sections:
+            return 0.0
+        sims: list[float] = []
+        weights: list[float] = []
+        # For each JD section, take the best matching resume section (same name preferred)
+        for jname, jw, pairs in self.sections:
+            best = 0.0
+            last = len(pairs) - 1
+            for i, (rname, pair) in enumerate(pairs):
+                sim = pair.cosine_with(add_tokens) if (add_tokens and i == last) else pair.cosine()
+                if rname == jname:
+                    sim *= 1.05  # tiny boost for same-section match
+                if sim > best:
+                    best = sim
+            sims.append(best)
+            weights.append(jw)
+        return sum(s * w for s, w in zip(sims, weights)) / max(1e-9, sum(weights))
+
+    def score(self, add: str | None = None) -> float:
+        add_tokens = tokenize(add) if add else []
+        sw = self.section_score(add_tokens)
+        g = self.global_pair.cosine_with(add_tokens) if add_tokens else self.global_pair.cosine()
+        # calibrated blend
+        return round((0.7 * sw + 0.3 * g) * 100, 2)
+
+    def result(self) -> Dict:
+        # term intel for UI
+        overlap = sorted(self.jd_terms & self.res_terms)
+        missing = sorted(self.jd_terms - self.res_terms)
+        top_terms = [t for t, _ in sorted(self.jd_vec[0].items(), key=lambda kv: (-kv[1], kv[0]))[:15]]
+        return {
+            "match_percent": self.score(),
+            "top_overlap": overlap[:20],
+            "missing_keywords": missing[:20],
+            "jd_top_terms": top_terms
+        }
+
+def weighted_cosine(resume_text: str, jd_text: str) -> Dict:
+    return {"score": MatchState(resume_text, jd_text).section_score()}
+
 def tfidf_match(resume_text: str, jd_text: str) -> Dict:
-    # global (whole-doc) similarity
-    vec = build_tfidf()
-    jd_norm = normalize_text(jd_text)
-    res_norm = normalize_text(resume_text)
-    X = vec.fit_transform([jd_norm, res_norm])
-    if X[0].nnz == 0 or X[1].nnz == 0:
-        sim_global = 0.0
-    else:
-        sim_global = float(cosine_similarity(X[0], X[1])[0][0])
-
-    # section-weighted similarity
-    sw = weighted_cosine(resume_text, jd_text)["score"]
-
-    # calibrated blend
-    sim = 0.7 * sw + 0.3 * sim_global
-    match_percent = round(sim * 100, 2)
-
-    # term intel for UI
-    jd_terms = set(tokenize(jd_text))
-    res_terms = set(tokenize(resume_text))
-    overlap = sorted(jd_terms & res_terms)
-    missing = sorted(jd_terms - res_terms)
-
-    feature_names = vec.get_feature_names_out()
-    if X[0].nnz:
-        jd_vec = X[0].toarray()[0]
-        top_idx = jd_vec.argsort()[::-1][:15]
-        top_terms = [feature_names[i] for i in top_idx]
-    else:
-        top_terms = []
+    return MatchState(resume_text, jd_text).result()
 
-    return {
-        "match_percent": match_percent,
-        "top_overlap": overlap[:20],
-        "missing_keywords": missing[:20],
-        "jd_top_terms": top_terms
-    }
+# ---- What-if: incremental score deltas for suggested skills
+def whatif_skill_deltas(states: List[MatchState], skills: List[str]) -> List[Dict]:
+    """
+    Rank `skills` by how much adding each to the resume would raise the
+    average match_percent over the analyses in `states` (one per JD).
+    """
+    if not states:
+        return []
+    base = round(sum(st.score() for st in states) / len(states), 2)
+    out: List[Dict] = []
+    for skill in skills:
+        new = round(sum(st.score(add=skill) for st in states) / len(states), 2)
+        out.append({"skill": skill, "delta": round(new - base, 2), "match_percent": new})
+    out.sort(key=lambda d: (-d["delta"], d["skill"]))
+    return out
 
 # ---- Skill suggestions
 def suggest_missing_skills(resume_text: str, jd_text: str, role_hint: str | None = None) -> List[str]: